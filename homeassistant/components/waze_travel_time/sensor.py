@@ -1,16 +1,21 @@
 """Support for Waze travel time sensor."""
 from __future__ import annotations
 
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
 from datetime import timedelta
 import logging
-import re
+import string
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, NamedTuple
 
 from WazeRouteCalculator import WazeRouteCalculator, WRCError
 
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
-    ATTR_ATTRIBUTION,
     CONF_NAME,
     CONF_REGION,
     CONF_UNIT_SYSTEM_IMPERIAL,
@@ -41,13 +46,92 @@ from .const import (
     DEFAULT_REALTIME,
     DEFAULT_VEHICLE_TYPE,
     DOMAIN,
-    ENTITY_ID_PATTERN,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+ATTRIBUTION = "Powered by Waze"
+
 SCAN_INTERVAL = timedelta(minutes=5)
 
+_KM_TO_MI = 1 / 1.609344
+
+# Options migrated out of config entry data created before options existed.
+_OPTION_KEYS = (
+    CONF_INCL_FILTER,
+    CONF_EXCL_FILTER,
+    CONF_REALTIME,
+    CONF_VEHICLE_TYPE,
+    CONF_AVOID_TOLL_ROADS,
+    CONF_AVOID_SUBSCRIPTION_ROADS,
+    CONF_AVOID_FERRIES,
+    CONF_UNITS,
+)
+_MISSING = object()
+
+# Raw route results shared between sensors querying the same trip.
+_ROUTE_CACHE: dict[tuple, tuple[float, dict]] = {}
+_ROUTE_CACHE_TTL = 60.0
+# Per trip locks, removed once no sensor holds or waits on them.
+_ROUTE_LOCKS: dict[tuple, threading.Lock] = {}
+_ROUTE_LOCK_USERS: dict[tuple, int] = {}
+_ROUTE_LOCKS_LOCK = threading.Lock()
+# Keep a sensor's last result for unchanged inputs refreshed sooner than this.
+_UNCHANGED_REFRESH_INTERVAL = 240.0
+
+_DOMAIN_CHARS = frozenset(string.ascii_lowercase + "_")
+_OBJECT_ID_CHARS = frozenset(string.ascii_letters + string.digits + "_")
+
+
+def _is_entity_id(value: str) -> bool:
+    """Return whether value fully matches ENTITY_ID_PATTERN."""
+    domain, sep, object_id = value.partition(".")
+    if not sep or not domain or not object_id:
+        return False
+    return all(char in _DOMAIN_CHARS for char in domain) and all(
+        char in _OBJECT_ID_CHARS for char in object_id
+    )
+
+
+class _RouteRequest(NamedTuple):
+    """Inputs of a route update for one sensor."""
+
+    calculator_key: tuple
+    realtime: bool
+    incl_filter: str | None
+    excl_filter: str | None
+    units: str
+
+    @property
+    def cache_key(self) -> tuple:
+        """Return the key of the unfiltered routes in the shared cache."""
+        return (*self.calculator_key, self.realtime)
+
+
+def _cached_routes(cache_key: tuple) -> tuple[float, dict] | None:
+    """Return fetch time and unfiltered routes of the trip within the cache TTL."""
+    cached = _ROUTE_CACHE.get(cache_key)
+    if cached is not None and time.monotonic() - cached[0] < _ROUTE_CACHE_TTL:
+        return cached
+    return None
+
+
+@contextmanager
+def _trip_lock(cache_key: tuple) -> Iterator[None]:
+    """Hold the lock for a trip so only one sensor fetches it at a time."""
+    with _ROUTE_LOCKS_LOCK:
+        lock = _ROUTE_LOCKS.setdefault(cache_key, threading.Lock())
+        _ROUTE_LOCK_USERS[cache_key] = _ROUTE_LOCK_USERS.get(cache_key, 0) + 1
+    try:
+        with lock:
+            yield
+    finally:
+        with _ROUTE_LOCKS_LOCK:
+            _ROUTE_LOCK_USERS[cache_key] -= 1
+            if not _ROUTE_LOCK_USERS[cache_key]:
+                del _ROUTE_LOCK_USERS[cache_key]
+                del _ROUTE_LOCKS[cache_key]
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -67,20 +151,12 @@ async def async_setup_entry(
     if not config_entry.options:
         new_data = config_entry.data.copy()
         options = {}
-        for key in (
-            CONF_INCL_FILTER,
-            CONF_EXCL_FILTER,
-            CONF_REALTIME,
-            CONF_VEHICLE_TYPE,
-            CONF_AVOID_TOLL_ROADS,
-            CONF_AVOID_SUBSCRIPTION_ROADS,
-            CONF_AVOID_FERRIES,
-            CONF_UNITS,
-        ):
-            if key in new_data:
-                options[key] = new_data.pop(key)
-            elif key in defaults:
-                options[key] = defaults[key]
+        for key in _OPTION_KEYS:
+            value = new_data.pop(key, _MISSING)
+            if value is _MISSING:
+                value = defaults.get(key, _MISSING)
+            if value is not _MISSING:
+                options[key] = value
         hass.config_entries.async_update_entry(
             config_entry, data=new_data, options=options
         )
@@ -104,6 +180,7 @@ async def async_setup_entry(
 class WazeTravelTime(SensorEntity):
     """Representation of a Waze travel time sensor."""
 
+    _attr_attribution = ATTRIBUTION
     _attr_native_unit_of_measurement = TIME_MINUTES
     _attr_device_info = DeviceInfo(
         entry_type=DeviceEntryType.SERVICE,
@@ -121,14 +198,15 @@ class WazeTravelTime(SensorEntity):
         self._state = None
         self._origin_entity_id = None
         self._destination_entity_id = None
+        self._attrs_cache: Mapping[str, Any] | None = None
+        self._attrs_cache_key: tuple | None = None
 
-        cmpl_re = re.compile(ENTITY_ID_PATTERN)
-        if cmpl_re.fullmatch(origin):
+        if _is_entity_id(origin):
             _LOGGER.debug("Found origin source entity %s", origin)
             self._origin_entity_id = origin
         else:
             self._waze_data.origin = origin
-        if cmpl_re.fullmatch(destination):
+        if _is_entity_id(destination):
             _LOGGER.debug("Found destination source entity %s", destination)
             self._destination_entity_id = destination
         else:
@@ -146,58 +224,88 @@ class WazeTravelTime(SensorEntity):
     @property
     def native_value(self) -> float | None:
         """Return the state of the sensor."""
-        if self._waze_data.duration is not None:
-            return round(self._waze_data.duration)
+        duration = self._waze_data.duration
+        if duration is not None:
+            return round(duration)
         return None
 
     @property
-    def extra_state_attributes(self) -> dict | None:
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
         """Return the state attributes of the last update."""
-        if self._waze_data.duration is None:
+        waze_data = self._waze_data
+        if waze_data.duration is None:
             return None
-        return {
-            ATTR_ATTRIBUTION: "Powered by Waze",
-            "duration": self._waze_data.duration,
-            "distance": self._waze_data.distance,
-            "route": self._waze_data.route,
-            "origin": self._waze_data.origin,
-            "destination": self._waze_data.destination,
-        }
+        cache_key = (waze_data.version, waze_data.origin, waze_data.destination)
+        if self._attrs_cache is None or cache_key != self._attrs_cache_key:
+            self._attrs_cache = MappingProxyType(
+                {
+                    "duration": waze_data.duration,
+                    "distance": waze_data.distance,
+                    "route": waze_data.route,
+                    "origin": waze_data.origin,
+                    "destination": waze_data.destination,
+                }
+            )
+            self._attrs_cache_key = cache_key
+        return self._attrs_cache
 
     async def first_update(self, _=None):
         """Run first update and write state."""
-        await self.hass.async_add_executor_job(self.update)
+        await self.async_update()
         self.async_write_ha_state()
 
-    def update(self):
+    async def async_update(self) -> None:
         """Fetch new state data for the sensor."""
         _LOGGER.debug("Fetching Route for %s", self._attr_name)
         # Get origin latitude and longitude from entity_id.
         if self._origin_entity_id is not None:
-            if find_coordinates(self.hass, self._origin_entity_id) is not None:
-                self._waze_data.origin = find_coordinates(
-                    self.hass, self._origin_entity_id
-                )
-            else:
-                self._waze_data.origin = self.hass.states.get(
-                    self._origin_entity_id
-                ).state
+            if (origin := self._entity_location(self._origin_entity_id)) is None:
+                return
+            self._waze_data.origin = origin
         # Get destination latitude and longitude from entity_id.
         if self._destination_entity_id is not None:
-            if find_coordinates(self.hass, self._destination_entity_id) is not None:
-                self._waze_data.destination = find_coordinates(
-                    self.hass, self._destination_entity_id
-                )
-            else:
-                self._waze_data.destination = self.hass.states.get(
-                    self._destination_entity_id
-                ).state
-        self._waze_data.update()
+            destination = self._entity_location(self._destination_entity_id)
+            if destination is None:
+                return
+            self._waze_data.destination = destination
+        waze_data = self._waze_data
+        request = waze_data.route_request()
+        if request is None or waze_data.is_current(request):
+            return
+        # A recent result for the same trip can be used without a worker thread.
+        if (cached := _cached_routes(request.cache_key)) is not None:
+            waze_data.apply_routes(request, *cached)
+        else:
+            await self.hass.async_add_executor_job(waze_data.update, request)
+
+    def _entity_location(self, entity_id: str) -> str | None:
+        """Return the coordinates or state of a source entity."""
+        if (coordinates := find_coordinates(self.hass, entity_id)) is not None:
+            return coordinates
+        # find_coordinates already logged a missing entity.
+        if (state := self.hass.states.get(entity_id)) is None:
+            return None
+        return state.state
 
 
 class WazeTravelTimeData:
     """WazeTravelTime Data object."""
 
+    __slots__ = (
+        "origin",
+        "destination",
+        "region",
+        "config_entry",
+        "duration",
+        "distance",
+        "route",
+        "version",
+        "_calculator",
+        "_calculator_key",
+        "_last_inputs",
+        "_last_update",
+    )
+
     def __init__(self, origin, destination, region, config_entry):
         """Set up WazeRouteCalculator."""
         self.origin = origin
@@ -207,63 +315,112 @@ class WazeTravelTimeData:
         self.duration = None
         self.distance = None
         self.route = None
+        self.version = 0
+        self._calculator = None
+        self._calculator_key = None
+        self._last_inputs = None
+        self._last_update = 0.0
 
-    def update(self):
+    def route_request(self) -> _RouteRequest | None:
+        """Return the inputs of the next update, if origin and destination are set."""
+        if self.origin is None or self.destination is None:
+            return None
+        # Grab options on every update
+        options = self.config_entry.options
+        incl_filter = options.get(CONF_INCL_FILTER)
+        if incl_filter is not None:
+            incl_filter = incl_filter.lower()
+        excl_filter = options.get(CONF_EXCL_FILTER)
+        if excl_filter is not None:
+            excl_filter = excl_filter.lower()
+        vehicle_type = options[CONF_VEHICLE_TYPE].upper()
+        if vehicle_type == "CAR":
+            vehicle_type = ""
+        calculator_key = (
+            self.origin,
+            self.destination,
+            self.region,
+            vehicle_type,
+            options[CONF_AVOID_TOLL_ROADS],
+            options[CONF_AVOID_SUBSCRIPTION_ROADS],
+            options[CONF_AVOID_FERRIES],
+        )
+        return _RouteRequest(
+            calculator_key,
+            options[CONF_REALTIME],
+            incl_filter,
+            excl_filter,
+            options[CONF_UNITS],
+        )
+
+    def is_current(self, request: _RouteRequest) -> bool:
+        """Return whether the last result for the same inputs is still recent."""
+        return (
+            request == self._last_inputs
+            and self.duration is not None
+            and time.monotonic() - self._last_update < _UNCHANGED_REFRESH_INTERVAL
+        )
+
+    def update(self, request: _RouteRequest) -> None:
         """Update WazeRouteCalculator Sensor."""
-        if self.origin is not None and self.destination is not None:
-            # Grab options on every update
-            incl_filter = self.config_entry.options.get(CONF_INCL_FILTER)
-            excl_filter = self.config_entry.options.get(CONF_EXCL_FILTER)
-            realtime = self.config_entry.options[CONF_REALTIME]
-            vehicle_type = self.config_entry.options[CONF_VEHICLE_TYPE]
-            vehicle_type = "" if vehicle_type.upper() == "CAR" else vehicle_type.upper()
-            avoid_toll_roads = self.config_entry.options[CONF_AVOID_TOLL_ROADS]
-            avoid_subscription_roads = self.config_entry.options[
-                CONF_AVOID_SUBSCRIPTION_ROADS
-            ]
-            avoid_ferries = self.config_entry.options[CONF_AVOID_FERRIES]
-            units = self.config_entry.options[CONF_UNITS]
-
-            try:
-                params = WazeRouteCalculator(
-                    self.origin,
-                    self.destination,
-                    self.region,
-                    vehicle_type,
-                    avoid_toll_roads,
-                    avoid_subscription_roads,
-                    avoid_ferries,
-                )
-                routes = params.calc_all_routes_info(real_time=realtime)
-
-                if incl_filter is not None:
-                    routes = {
-                        k: v
-                        for k, v in routes.items()
-                        if incl_filter.lower() in k.lower()
-                    }
-                if excl_filter is not None:
-                    routes = {
-                        k: v
-                        for k, v in routes.items()
-                        if excl_filter.lower() not in k.lower()
-                    }
-                if routes:
-                    route = list(routes)[0]
-                else:
-                    _LOGGER.warning("No routes found")
-                    return
-                self.duration, distance = routes[route]
-
-                if units == CONF_UNIT_SYSTEM_IMPERIAL:
-                    # Convert to miles.
-                    self.distance = distance / 1.609
-                else:
-                    self.distance = distance
-                self.route = route
-            except WRCError as exp:
-                _LOGGER.warning("Error on retrieving data: %s", exp)
-                return
-            except KeyError:
-                _LOGGER.error("Error retrieving data from server")
-                return
+        try:
+            self.apply_routes(request, *self._fetch_routes(request))
+        except WRCError as exp:
+            _LOGGER.warning("Error on retrieving data: %s", exp)
+        except KeyError:
+            _LOGGER.error("Error retrieving data from server")
+
+    def apply_routes(
+        self, request: _RouteRequest, fetched: float, routes: dict
+    ) -> None:
+        """Update the sensor data from the unfiltered routes of the trip."""
+        incl_filter = request.incl_filter
+        excl_filter = request.excl_filter
+        if incl_filter is not None or excl_filter is not None:
+            filtered = {}
+            for k, v in routes.items():
+                name = k.lower()
+                if (incl_filter is None or incl_filter in name) and (
+                    excl_filter is None or excl_filter not in name
+                ):
+                    filtered[k] = v
+            routes = filtered
+        if not routes:
+            _LOGGER.warning("No routes found")
+            return
+        route = next(iter(routes))
+        self.duration, distance = routes[route]
+
+        if request.units == CONF_UNIT_SYSTEM_IMPERIAL:
+            # Convert to miles.
+            self.distance = distance * _KM_TO_MI
+        else:
+            self.distance = distance
+        self.route = route
+        self.version += 1
+        self._last_inputs = request
+        # Age the result from when Waze was queried, not when it was applied.
+        self._last_update = fetched
+
+    def _fetch_routes(self, request: _RouteRequest) -> tuple[float, dict]:
+        """Return fetch time and unfiltered routes, shared for the same trip."""
+        calculator_key = request.calculator_key
+        cache_key = request.cache_key
+        # Sensors polling the same trip concurrently wait for a single request.
+        with _trip_lock(cache_key):
+            if (cached := _cached_routes(cache_key)) is not None:
+                return cached
+
+            # Address origins are geocoded when the calculator is built,
+            # so only rebuild it when the trip or routing options change.
+            if calculator_key != self._calculator_key:
+                self._calculator = WazeRouteCalculator(*calculator_key)
+                self._calculator_key = calculator_key
+            routes = self._calculator.calc_all_routes_info(real_time=request.realtime)
+
+            now = time.monotonic()
+            for key, (fetched, _) in list(_ROUTE_CACHE.items()):
+                if now - fetched >= _ROUTE_CACHE_TTL:
+                    _ROUTE_CACHE.pop(key, None)
+            _ROUTE_CACHE[cache_key] = (now, routes)
+        return now, routes
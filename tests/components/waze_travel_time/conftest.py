@@ -4,12 +4,25 @@ from unittest.mock import patch
 from WazeRouteCalculator import WRCError
 import pytest
 
+from homeassistant.components.waze_travel_time import sensor
+
 
 @pytest.fixture(autouse=True)
 def mock_wrc():
     """Mock out WazeRouteCalculator."""
-    with patch("homeassistant.components.waze_travel_time.sensor.WazeRouteCalculator"):
-        yield
+    with patch(
+        "homeassistant.components.waze_travel_time.sensor.WazeRouteCalculator"
+    ) as mock_wrc:
+        yield mock_wrc
+
+
+@pytest.fixture(autouse=True)
+def clear_route_cache():
+    """Clear routes shared between sensors so they don't leak between tests."""
+    yield
+    sensor._ROUTE_CACHE.clear()
+    sensor._ROUTE_LOCKS.clear()
+    sensor._ROUTE_LOCK_USERS.clear()
 
 
 @pytest.fixture(name="validate_config_entry")
@@ -44,13 +57,9 @@ def bypass_platform_setup_fixture():
 
 
 @pytest.fixture(name="mock_update")
-def mock_update_fixture():
+def mock_update_fixture(mock_wrc):
     """Mock an update to the sensor."""
-    with patch(
-        "homeassistant.components.waze_travel_time.sensor.WazeRouteCalculator.calc_all_routes_info",
-        return_value={"My route": (150, 300)},
-    ):
-        yield
+    mock_wrc.return_value.calc_all_routes_info.return_value = {"My route": (150, 300)}
 
 
 @pytest.fixture(name="invalidate_config_entry")
@@ -0,0 +1,237 @@
+"""Test the Waze Travel Time sensor."""
+from unittest.mock import patch
+
+from WazeRouteCalculator import WRCError
+import pytest
+
+from homeassistant.components.waze_travel_time.const import (
+    CONF_AVOID_FERRIES,
+    CONF_AVOID_SUBSCRIPTION_ROADS,
+    CONF_AVOID_TOLL_ROADS,
+    CONF_DESTINATION,
+    CONF_EXCL_FILTER,
+    CONF_INCL_FILTER,
+    CONF_ORIGIN,
+    CONF_REALTIME,
+    CONF_UNITS,
+    CONF_VEHICLE_TYPE,
+    DOMAIN,
+)
+from homeassistant.const import (
+    CONF_NAME,
+    CONF_REGION,
+    CONF_UNIT_SYSTEM_IMPERIAL,
+    CONF_UNIT_SYSTEM_METRIC,
+    EVENT_HOMEASSISTANT_STARTED,
+    STATE_UNKNOWN,
+)
+from homeassistant.core import CoreState
+from homeassistant.helpers.entity_component import async_update_entity
+
+from tests.common import MockConfigEntry
+
+MOCK_ROUTES = {"A-Highway": (150.0, 300.0), "B-Scenic": (170.4, 280.0)}
+
+MOCK_OPTIONS = {
+    CONF_AVOID_FERRIES: False,
+    CONF_AVOID_SUBSCRIPTION_ROADS: False,
+    CONF_AVOID_TOLL_ROADS: False,
+    CONF_REALTIME: True,
+    CONF_UNITS: CONF_UNIT_SYSTEM_METRIC,
+    CONF_VEHICLE_TYPE: "car",
+}
+
+
+@pytest.fixture(name="mock_routes")
+def mock_routes_fixture(mock_wrc):
+    """Return the mocked route lookup of WazeRouteCalculator."""
+    calc = mock_wrc.return_value.calc_all_routes_info
+    calc.return_value = MOCK_ROUTES
+    return calc
+
+
+@pytest.fixture(name="mock_monotonic")
+def mock_monotonic_fixture():
+    """Control the clock used to age shared routes."""
+    with patch("homeassistant.components.waze_travel_time.sensor.time") as mock_time:
+        mock_time.monotonic.return_value = 1000.0
+        yield mock_time.monotonic
+
+
+async def _setup_entry(hass, name, origin="location1", **options):
+    """Set up a Waze Travel Time sensor and return its config entry."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            CONF_NAME: name,
+            CONF_ORIGIN: origin,
+            CONF_DESTINATION: "location2",
+            CONF_REGION: "US",
+        },
+        options={**MOCK_OPTIONS, **options},
+    )
+    entry.add_to_hass(hass)
+    await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    return entry
+
+
+async def test_sensor(hass, mock_routes):
+    """Test the sensor reports the first route."""
+    await _setup_entry(hass, "Commute")
+
+    state = hass.states.get("sensor.commute")
+    assert state.state == "150"
+    assert state.attributes["attribution"] == "Powered by Waze"
+    assert state.attributes["duration"] == 150.0
+    assert state.attributes["distance"] == 300.0
+    assert state.attributes["route"] == "A-Highway"
+    assert state.attributes["origin"] == "location1"
+    assert state.attributes["destination"] == "location2"
+
+
+async def test_sensor_imperial(hass, mock_routes):
+    """Test the distance is converted to miles."""
+    await _setup_entry(hass, "Commute", **{CONF_UNITS: CONF_UNIT_SYSTEM_IMPERIAL})
+
+    state = hass.states.get("sensor.commute")
+    assert state.attributes["distance"] == pytest.approx(186.411358)
+
+
+async def test_filters_share_routes(hass, mock_routes):
+    """Test sensors on the same trip share one lookup and filter it themselves."""
+    await _setup_entry(hass, "Scenic", **{CONF_INCL_FILTER: "SCENIC"})
+    await _setup_entry(hass, "Fast", **{CONF_EXCL_FILTER: "scenic"})
+
+    assert mock_routes.call_count == 1
+    assert hass.states.get("sensor.scenic").state == "170"
+    assert hass.states.get("sensor.scenic").attributes["route"] == "B-Scenic"
+    assert hass.states.get("sensor.fast").state == "150"
+    assert hass.states.get("sensor.fast").attributes["route"] == "A-Highway"
+
+
+async def test_shared_routes_expire(hass, mock_routes, mock_monotonic):
+    """Test shared routes are only reused within the cache TTL."""
+    await _setup_entry(hass, "First")
+    assert mock_routes.call_count == 1
+
+    mock_monotonic.return_value += 30
+    await _setup_entry(hass, "Second")
+    assert mock_routes.call_count == 1
+
+    mock_monotonic.return_value += 31
+    await _setup_entry(hass, "Third")
+    assert mock_routes.call_count == 2
+    assert hass.states.get("sensor.third").state == "150"
+
+
+async def test_errors_not_cached(hass, mock_routes):
+    """Test a failed lookup is retried on the next update."""
+    mock_routes.side_effect = WRCError("test")
+    await _setup_entry(hass, "Commute")
+    assert hass.states.get("sensor.commute").state == STATE_UNKNOWN
+
+    mock_routes.side_effect = None
+    await async_update_entity(hass, "sensor.commute")
+    await hass.async_block_till_done()
+
+    assert mock_routes.call_count == 2
+    assert hass.states.get("sensor.commute").state == "150"
+
+
+async def test_first_update_cache_hit_skips_executor(hass, mock_routes):
+    """Test a first update served from shared routes runs no executor job."""
+    await _setup_entry(hass, "First")
+
+    hass.state = CoreState.starting
+    await _setup_entry(hass, "Second")
+    assert hass.states.get("sensor.second").state == STATE_UNKNOWN
+
+    hass.state = CoreState.running
+    with patch.object(
+        hass, "async_add_executor_job", wraps=hass.async_add_executor_job
+    ) as mock_executor:
+        hass.bus.async_fire(EVENT_HOMEASSISTANT_STARTED)
+        await hass.async_block_till_done()
+
+    mock_executor.assert_not_called()
+    assert mock_routes.call_count == 1
+    assert hass.states.get("sensor.second").state == "150"
+
+
+async def test_attributes_cached_until_data_changes(hass, mock_routes, mock_monotonic):
+    """Test attributes are rebuilt only when the sensor data changes."""
+    hass.states.async_set(
+        "device_tracker.phone", "not_home", {"latitude": 1.0, "longitude": 2.0}
+    )
+    await _setup_entry(hass, "Commute", origin="device_tracker.phone")
+    entity = hass.data["entity_components"]["sensor"].get_entity("sensor.commute")
+
+    attributes = entity.extra_state_attributes
+    assert entity.extra_state_attributes is attributes
+    assert attributes["origin"] == "1.0,2.0"
+    with pytest.raises(TypeError):
+        attributes["route"] = "B-Scenic"
+
+    # A successful update bumps the data version.
+    version = entity._waze_data.version
+    mock_routes.return_value = {"B-Scenic": (170.4, 280.0)}
+    mock_monotonic.return_value += 300
+    await async_update_entity(hass, "sensor.commute")
+    await hass.async_block_till_done()
+
+    assert entity._waze_data.version == version + 1
+    updated = entity.extra_state_attributes
+    assert updated is not attributes
+    assert updated["route"] == "B-Scenic"
+    assert entity.extra_state_attributes is updated
+
+    # The origin moves but the lookup fails, leaving the version unchanged.
+    hass.states.async_set(
+        "device_tracker.phone", "not_home", {"latitude": 3.0, "longitude": 4.0}
+    )
+    mock_routes.side_effect = WRCError("test")
+    await async_update_entity(hass, "sensor.commute")
+    await hass.async_block_till_done()
+
+    assert entity._waze_data.version == version + 1
+    moved = entity.extra_state_attributes
+    assert moved is not updated
+    assert moved["origin"] == "3.0,4.0"
+    assert moved["route"] == "B-Scenic"
+
+
+async def test_calculator_reused(hass, mock_wrc, mock_routes, mock_monotonic):
+    """Test the route calculator is only rebuilt when its inputs change."""
+    hass.states.async_set(
+        "device_tracker.phone", "not_home", {"latitude": 1.0, "longitude": 2.0}
+    )
+    entry = await _setup_entry(hass, "Commute", origin="device_tracker.phone")
+    assert mock_wrc.call_count == 1
+    assert mock_routes.call_count == 1
+
+    # Unchanged inputs poll again with the same calculator.
+    mock_monotonic.return_value += 300
+    await async_update_entity(hass, "sensor.commute")
+    await hass.async_block_till_done()
+    assert mock_wrc.call_count == 1
+    assert mock_routes.call_count == 2
+
+    # Changed routing options build a new calculator.
+    hass.config_entries.async_update_entry(
+        entry, options={**entry.options, CONF_AVOID_FERRIES: True}
+    )
+    await async_update_entity(hass, "sensor.commute")
+    await hass.async_block_till_done()
+    assert mock_wrc.call_count == 2
+    assert mock_wrc.call_args[0][6] is True
+
+    # A moved origin builds a new calculator.
+    hass.states.async_set(
+        "device_tracker.phone", "not_home", {"latitude": 3.0, "longitude": 4.0}
+    )
+    await async_update_entity(hass, "sensor.commute")
+    await hass.async_block_till_done()
+    assert mock_wrc.call_count == 3
+    assert mock_wrc.call_args[0][0] == "3.0,4.0"
+    assert mock_routes.call_count == 4